@@ -0,0 +1,36 @@
+from flipcache import FlipCache, et
+
+"""
+Storing values as native RedisJSON documents
+Requires redis server with RedisJSON module loaded, e.g. redis-stack
+"""
+
+user_data = FlipCache(
+    "user_data_rejson",
+    local_max=100,
+    expire_time=et.THREE_DAYS,
+    value_type="rejson"
+)
+
+data = {
+    "state": 1,
+    "orders": [1, 2, 3, 4],
+    "items": {
+        "foo": 1,
+        "bar": True,
+        "baz": []
+    }
+}
+
+# Store data
+user_data["some-uuid"] = data
+print(user_data["some-uuid"])  # {'state': 1, 'orders': [1, 2, 3, 4], 'items': {'foo': 1, 'bar': True, 'baz': []}}
+
+# Update only the changed parts, without re-sending the whole document
+user_data.update_path("some-uuid", "$.state", 2)
+user_data.update_path("some-uuid", "$.items.bar", False)
+print(user_data["some-uuid"])  # {'state': 2, 'orders': [1, 2, 3, 4], 'items': {'foo': 1, 'bar': False, 'baz': []}}
+
+# Delete data
+del user_data["some-uuid"]
+print(user_data["some-uuid"])  # None
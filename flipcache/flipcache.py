@@ -1,15 +1,143 @@
+import atexit
+import functools
 import json
+import logging
+import os
+import threading
+import weakref
 import redis
-from typing import Any, Union, Optional, Literal, Callable, Iterator
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from typing import Any, Union, Optional, Literal, Callable, Iterator, Iterable, Mapping, List
 from collections import OrderedDict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 STRINT = Union[str, int]
 KEY_TYPES = {"str", "int"}
-VALUE_TYPES = {"str", "int", "json", "custom"}
+VALUE_TYPES = {"str", "int", "json", "orjson", "rejson", "custom"}
+
+_MISSING = object()
+# Only values that can't be mutated in place are compared by skip_equal_writes
+_IMMUTABLE_TYPES = {str, int, float, bool, bytes}
+SCAN_COUNT = 1000
+# Legacy root path, returns the document itself instead of a single-element array like '$' does
+JSON_ROOT = "."
+REDIS_SOCKET_PATHS = ("/var/run/redis/redis.sock", "/var/run/redis/redis-server.sock")
+
+logger = logging.getLogger(__name__)
+
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+# value_type -> (encoder, decoder) for non-custom value types
+# Without an encoder, 'str' values are converted with str() on write,
+# and 'int' values are passed to redis-py as is
+CODECS = {
+    "str": (None, None),
+    "int": (None, int),
+    "json": (json.dumps, json.loads),
+    "rejson": (json.dumps, json.loads),
+}
+if orjson is not None:
+    CODECS["orjson"] = (_orjson_dumps, orjson.loads)
+
+
+def _default_redis(unix_socket: bool = False) -> redis.Redis:
+    if unix_socket:
+        # Local unix socket skips the loopback TCP stack on every round-trip
+        for path in REDIS_SOCKET_PATHS:
+            if not os.access(path, os.R_OK | os.W_OK):
+                continue
+            # Probed once without retries, a stale socket file would otherwise cost seconds of backoff
+            probe = redis.Redis(
+                unix_socket_path=path, retry=Retry(NoBackoff(), 0), socket_connect_timeout=1
+            )
+            try:
+                probe.ping()
+            except redis.RedisError:
+                continue
+            finally:
+                probe.close()
+            return redis.Redis(unix_socket_path=path, decode_responses=True)
+    return redis.Redis(
+        decode_responses=True, socket_keepalive=True, health_check_interval=30
+    )
+
+
+def _flush_loop(
+    cache_ref: weakref.ref,
+    stop: threading.Event,
+    wakeup: threading.Event,
+    interval: float,
+) -> None:
+    # Holds only a weak reference, so an unused cache can be garbage collected
+    while True:
+        wakeup.wait(interval)
+        wakeup.clear()
+        cache = cache_ref()
+        if cache is None or stop.is_set():
+            return
+        try:
+            cache.flush()
+        except redis.RedisError:
+            # Pending writes are kept and retried on the next flush
+            logger.warning("FlipCache<%s> background flush failed", cache._kp, exc_info=True)
+        del cache
+
+
+def _flush_at_exit(cache_ref: weakref.ref) -> None:
+    cache = cache_ref()
+    if cache is not None:
+        cache.flush()
+
+
+def _str_key(key: Any) -> str:
+    return key if type(key) is str else str(key)
+
+
+def _int_key(key: Any) -> int:
+    return key if type(key) is int else int(key)
 
 
 class FlipCache:
+    __slots__ = (
+        "_redis",
+        "__data",
+        "_lmax",
+        "_et",
+        "_kp",
+        "_prefix",
+        "_default",
+        "_refresh_et",
+        "_index_key",
+        "_kt",
+        "_coerce",
+        "_encoder",
+        "_decoder",
+        "_str_values",
+        "_rejson",
+        "_read",
+        "_skip_equal",
+        "_dirty",
+        "_dirty_lock",
+        "_inflight",
+        "_flush_lock",
+        "_flush_batch",
+        "_flush_event",
+        "_flush_stop",
+        "_flush_thread",
+        "_flush_atexit",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         name: str,
@@ -17,12 +145,18 @@ class FlipCache:
         local_max: int = 100,
         expire_time: Optional[int] = None,
         key_type: Literal["str", "int"] = "str",
-        value_type: Literal["str", "int", "json", "custom"] = "str",
+        value_type: Literal["str", "int", "json", "orjson", "rejson", "custom"] = "str",
         value_default: Any = None,
         value_encoder: Optional[Callable] = None,
         value_decoder: Optional[Callable] = None,
         redis_protocol: redis.Redis = None,
         refresh_expire_time_on_get: bool = False,
+        keep_index: bool = False,
+        write_behind: bool = False,
+        flush_batch: int = 128,
+        flush_interval_ms: int = 50,
+        skip_equal_writes: bool = False,
+        prefer_unix_socket: bool = False,
     ) -> None:
         """
         FlipCache class
@@ -35,7 +169,12 @@ class FlipCache:
             If not specified it will disable expiring keys.
         :param key_type: Data type of key, can be 'str' or 'int'. Defaults to 'str'
         :param value_type: Data type of value to be stored. Defaults to 'str'
-            Possible options are 'str', 'int', 'json' or 'custom'
+            Possible options are 'str', 'int', 'json', 'orjson', 'rejson' or 'custom'
+            When 'orjson' is set, values are stored as JSON encoded with orjson (requires orjson), which is faster
+                than the standard json module but rejects NaN and Infinity on read, writes them as null,
+                and doesn't support integers beyond 64 bits
+            When 'rejson' is set, values are stored as native RedisJSON documents (requires the RedisJSON module)
+                and can be partially updated with update_path()
             When 'custom' is set, :param value_encoder and :param value_decoder must be passed
         :param value_encoder: Custom function used to encode the value before passing it to redis
         :param value_decoder: Custom function used to decode the value coming from redis
@@ -43,17 +182,40 @@ class FlipCache:
         :param value_default: Default value to be saved or returned if key not exists.
             Defaults to None
         :param redis_protocol: custom redis.Redis instance to be passed. Should have decode_responses=True
-            If not specified new redis.Redis() instance will be created implicitly
+            If not specified new redis.Redis() instance will be created implicitly, connecting to TCP localhost
+        :param keep_index: Track stored keys in a companion redis set, so len() and iteration
+            don't need to scan the whole keyspace. Keys stored before enabling it are not tracked.
+            Can't be combined with expire_time, since expired keys are not removed from the index.
+        :param write_behind: Only update local memory on set, and write changes to redis from a background
+            thread in pipelined batches. Durability is best-effort: unflushed writes are lost if the process dies.
+            Call flush() to write pending changes synchronously, and close() or use the cache as a context manager
+            to stop the background thread when the cache is no longer needed.
+            len() and iteration flush pending changes first, since they are answered by redis.
+        :param flush_batch: Number of pending writes that triggers an early flush in write_behind mode. Defaults to 128
+        :param flush_interval_ms: Interval between background flushes in write_behind mode. Defaults to 50
+        :param prefer_unix_socket: Make the implicitly created redis.Redis() instance connect through the first
+            reachable local unix socket of REDIS_SOCKET_PATHS, falling back to TCP localhost. Defaults to False
+        :param skip_equal_writes: Don't send redis SET when the value equals the one in local memory.
+            Only str, int, float, bool and bytes values are compared, other values are always written.
+            Note: skipped writes don't reset the expire time, and don't restore keys removed from redis externally.
         :raise AssertionError when:
             - specified key_type is not int or str
+            - value_type is 'orjson' and orjson is not installed
             - redis_protocol instance doesn't have decode_responses=True connection argument set
+            - keep_index is set together with expire_time
         """
 
         assert key_type in KEY_TYPES, "Invalid key_type, must be 'int' or 'str'"
         assert (
             value_type in VALUE_TYPES
-        ), "Invalid value_type, must be 'str', 'int', 'json' or 'custom'"
+        ), "Invalid value_type, must be 'str', 'int', 'json', 'orjson', 'rejson' or 'custom'"
         assert local_max is not None, "local_max cannot be None"
+        assert (
+            value_type != "orjson" or orjson is not None
+        ), "orjson must be installed to use value_type 'orjson'"
+        assert not (
+            keep_index and expire_time
+        ), "keep_index cannot be used together with expire_time"
 
         if value_type == "custom":
             assert value_encoder and value_decoder, (
@@ -71,99 +233,241 @@ class FlipCache:
                 ), "Redis protocol with decode_responses=True must be passed when using non-custom value_type"
             self._redis = redis_protocol
         else:
-            self._redis = redis.Redis(decode_responses=True)
+            self._redis = _default_redis(prefer_unix_socket)
 
         self.__data = OrderedDict()
         self._lmax = local_max
         self._et = expire_time
         self._kp = name
+        self._prefix = f"{name}:"
         self._default = value_default
         self._refresh_et = refresh_expire_time_on_get
+        self._skip_equal = skip_equal_writes
+        self._index_key = f"__flipcache_index__:{name}" if keep_index else None
 
         self._kt = str
+        self._coerce = _str_key
         if key_type == "int":
             self._kt = int
+            self._coerce = _int_key
 
-        self._encoder = str
-        self._decoder = None
-
-        if value_type == "json":
-            self._encoder = json.dumps
-            self._decoder = json.loads
-
-        elif value_type == "int":
-            self._encoder = None
-            self._decoder = int
-
-        elif value_type == "custom":
+        if value_type == "custom":
             self._encoder = value_encoder
             self._decoder = value_decoder
+        else:
+            self._encoder, self._decoder = CODECS[value_type]
+
+        self._str_values = value_type == "str"
+        self._rejson = value_type == "rejson"
+
+        # Redis read command for a local miss is fixed by the configuration, so pick it once
+        if self._et and self._refresh_et:
+            # GETEX doesn't work on RedisJSON documents
+            self._read = self._read_pipelined if self._rejson else self._read_getex
+        elif self._rejson:
+            self._read = self._read_json
+        else:
+            self._read = self._redis.get
+
+        self._dirty = None
+        if write_behind:
+            self._dirty = {}
+            self._dirty_lock = threading.Lock()
+            # Batch being sent by flush(), still visible to readers until redis has it
+            self._inflight = {}
+            self._flush_lock = threading.Lock()
+            self._flush_batch = flush_batch
+            self._flush_event = threading.Event()
+            self._flush_stop = threading.Event()
+
+            ref = weakref.ref(self)
+            self._flush_thread = threading.Thread(
+                target=_flush_loop,
+                args=(ref, self._flush_stop, self._flush_event, flush_interval_ms / 1000),
+                daemon=True,
+            )
+            self._flush_thread.start()
+            self._flush_atexit = functools.partial(_flush_at_exit, ref)
+            atexit.register(self._flush_atexit)
 
     def _key(self, name: STRINT) -> str:
-        return f"{self._kp}:{name}"
+        return self._prefix + (name if type(name) is str else str(name))
 
-    def __getitem__(self, key: STRINT) -> Any:
-        if type(key) is not self._kt:
-            key = self._kt(key)
+    def _encode(self, data: Any) -> Any:
+        if self._encoder:
+            return self._encoder(data)
+        if self._str_values and type(data) is not str:
+            return str(data)
+        return data
+
+    def _queue_get(self, pipe: redis.client.Pipeline, rk: str) -> None:
+        if self._rejson:
+            pipe.execute_command("JSON.GET", rk, JSON_ROOT)
+        else:
+            pipe.get(rk)
 
-        if key in self.__data:
-            return self.__data[key]
+    def _queue_set(self, pipe: redis.client.Pipeline, rk: str, data: Any) -> None:
+        if self._rejson:
+            pipe.execute_command("JSON.SET", rk, "$", data)
+            if self._et:
+                pipe.expire(rk, self._et)
         else:
-            data = self._redis.get(self._key(key))
+            pipe.set(rk, data, ex=self._et)
+
+    def _queue_batch(self, pipe: redis.client.Pipeline, batch: List[tuple]) -> None:
+        prefix_len = len(self._prefix)
+        for rk, data in batch:
+            self._queue_set(pipe, rk, data)
+            if self._index_key:
+                pipe.sadd(self._index_key, rk[prefix_len:])
+
+    def _write(self, rk: str, data: Any) -> None:
+        if self._index_key or self._rejson:
+            pipe = self._redis.pipeline(transaction=False)
+            self._queue_batch(pipe, [(rk, data)])
+            pipe.execute()
+        else:
+            self._redis.set(rk, data, ex=self._et)
+
+    def _read_json(self, rk: str) -> Any:
+        return self._redis.execute_command("JSON.GET", rk, JSON_ROOT)
+
+    def _read_getex(self, rk: str) -> Any:
+        try:
+            return self._redis.getex(rk, ex=self._et)
+        except redis.ResponseError as e:
+            # GETEX is available since redis 6.2
+            if "unknown command" not in str(e).lower():
+                raise
+            self._read = self._read_pipelined
+            return self._read_pipelined(rk)
+
+    def _read_pipelined(self, rk: str) -> Any:
+        pipe = self._redis.pipeline(transaction=False)
+        self._queue_get(pipe, rk)
+        pipe.expire(rk, self._et)
+        data, _ = pipe.execute()
+        return data
+
+    def _fetch(self, key: STRINT) -> Any:
+        rk = self._prefix + (key if type(key) is str else str(key))
+        # Pending write-behind value is newer than the one in redis
+        data = self._pending(rk) if self._dirty is not None else None
+        if data is None:
+            data = self._read(rk)
+
+        if not data:
+            return _MISSING
+
+        if self._decoder:
+            data = self._decoder(data)
+
+        self._promote(key, data)
+        return data
 
-            if data:
-                if self._decoder:
-                    data = self._decoder(data)
+    def __getitem__(self, key: STRINT) -> Any:
+        key = self._coerce(key)
+
+        data = self.__data.get(key, _MISSING)
+        if data is not _MISSING:
+            return data
+
+        data = self._fetch(key)
+        if data is not _MISSING:
+            return data
 
-                if len(self.__data) >= self._lmax:
-                    self.__data[key] = data
-                    self.__data.popitem(last=False)
-                else:
-                    self.__data[key] = data
+        if self._default is not None:
+            self.__setitem__(key, self._default)
+        return self._default
 
-                if self._et and self._refresh_et:
-                    self._redis.expire(self._key(key), self._et)
+    def get_or_none(self, key: STRINT) -> Any:
+        """
+        Get the value of a key in a single redis round-trip at most, without side effects on miss.
+        Prefer it over `if key in cache: cache[key]`, which costs two round-trips
+
+        :param key: key to be retrieved
+        :return: stored value, or None if key not exists. value_default is neither returned nor saved
+        """
+        key = self._coerce(key)
 
-                return data
-            else:
-                if self._default is not None:
-                    self.__setitem__(key, self._default)
-                return self._default
+        data = self.__data.get(key, _MISSING)
+        if data is not _MISSING:
+            return data
+
+        data = self._fetch(key)
+        return None if data is _MISSING else data
 
     def __setitem__(self, key: STRINT, data: Any) -> None:
-        if type(key) is not self._kt:
-            key = self._kt(key)
+        key = self._coerce(key)
 
-        self.__data[key] = data
+        if self._skip_equal and self._unchanged(key, data):
+            return
 
-        if self._encoder:
-            data = self._encoder(data)
-        self._redis.set(self._key(key), data, ex=self._et)
-        self._check_size_limit()
+        self._promote(key, data)
+        data = self._encode(data)
 
-    def __delitem__(self, key: STRINT) -> None:
-        if type(key) is not self._kt:
-            key = self._kt(key)
+        rk = self._prefix + (key if type(key) is str else str(key))
+        if self._dirty is not None:
+            self._mark_dirty(rk, data)
+        else:
+            self._write(rk, data)
 
-        if key in self.__data:
-            del self.__data[key]
-        self._redis.delete(self._key(key))
+    def __delitem__(self, key: STRINT) -> None:
+        key = self._coerce(key)
+
+        self.__data.pop(key, None)
+
+        sk = key if type(key) is str else str(key)
+        if self._dirty is not None:
+            with self._dirty_lock:
+                # Checked again, close() may have switched to write-through meanwhile
+                if self._dirty is not None:
+                    self._dirty.pop(self._prefix + sk, None)
+                    # flush() in progress deletes it again once its batch lands
+                    self._inflight.pop(self._prefix + sk, None)
+
+        if self._index_key:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.delete(self._prefix + sk)
+            pipe.srem(self._index_key, sk)
+            pipe.execute()
+        else:
+            self._redis.delete(self._prefix + sk)
 
     def __contains__(self, key: STRINT) -> bool:
-        if type(key) is not self._kt:
-            key = self._kt(key)
-        return key in self.__data or self._redis.exists(self._key(key))
+        key = self._coerce(key)
+        rk = self._prefix + (key if type(key) is str else str(key))
+        return (
+            key in self.__data
+            or (self._dirty is not None and self._pending(rk) is not None)
+            or self._redis.exists(rk)
+        )
 
     def __iter__(self) -> Iterator[STRINT]:
-        for key in self._redis.scan_iter(match=f"{self._kp}:*"):
-            yield self._kt(key[key.find(":") + 1 :])
+        # Keys pending in write_behind mode must be in redis to be scanned
+        self.flush()
+
+        kt = self._kt
+        if self._index_key:
+            for key in self._redis.sscan_iter(self._index_key, count=SCAN_COUNT):
+                yield kt(key)
+            return
+
+        prefix_len = len(self._prefix)
+        for key in self._redis.scan_iter(match=f"{self._kp}:*", count=SCAN_COUNT):
+            yield kt(key[prefix_len:])
 
     def __len__(self) -> int:
+        self.flush()
+
+        if self._index_key:
+            return self._redis.scard(self._index_key)
+
         count = 0
         cursor = "0"
         while cursor != 0:
             cursor, data = self._redis.scan(
-                cursor=cursor, match=f"{self._kp}:*", count=100
+                cursor=cursor, match=f"{self._kp}:*", count=SCAN_COUNT
             )
             count += len(data)
         return count
@@ -179,13 +483,259 @@ class FlipCache:
     def local(self) -> OrderedDict:
         return self.__data
 
-    def _check_size_limit(self) -> None:
-        if len(self.__data) > self._lmax:
-            self.__data.popitem(last=False)
+    @property
+    def redis_protocol(self) -> redis.Redis:
+        return self._redis
+
+    def _unchanged(self, key: STRINT, data: Any) -> bool:
+        current = self.__data.get(key, _MISSING)
+        # Equal values of different types (1, 1.0, True) are encoded differently.
+        # Local value_default is a placeholder from a miss rather than a value set by the caller,
+        # so writing over it always goes to redis
+        if current is _MISSING or type(current) is not type(data) or current is self._default:
+            return False
+        # Local copy of a mutable value is the caller's reference, it may have been changed in place
+        # since it was written and no longer match redis
+        return type(data) in _IMMUTABLE_TYPES and current == data
+
+    def _promote(self, key: STRINT, data: Any) -> None:
+        d = self.__data
+        d[key] = data
+        if len(d) > self._lmax:
+            d.popitem(last=False)
+
+    def _evict_down_to(self, target: int) -> None:
+        d = self.__data
+        pop = d.popitem
+        while len(d) > target:
+            pop(last=False)
+
+    def mset(self, mapping: Mapping[STRINT, Any]) -> None:
+        """
+        Set multiple keys at once, sending all writes to redis in a single pipeline
+
+        :param mapping: key-value pairs to be stored
+        """
+        # In write_behind mode writes are only marked dirty, flush() sends them later
+        pipe = None if self._dirty is not None else self._redis.pipeline(transaction=False)
+        for key, data in mapping.items():
+            key = self._coerce(key)
+            if self._skip_equal and self._unchanged(key, data):
+                continue
+
+            self.__data[key] = data
+            data = self._encode(data)
+
+            if pipe is None:
+                self._mark_dirty(self._key(key), data)
+                continue
+
+            self._queue_set(pipe, self._key(key), data)
+            if self._index_key:
+                pipe.sadd(self._index_key, key)
+
+        if pipe is not None:
+            pipe.execute()
+        self._evict_down_to(self._lmax)
+
+    def mget(self, keys: Iterable[STRINT]) -> List[Any]:
+        """
+        Get multiple keys at once, fetching locally missing keys from redis in a single pipeline
+
+        :param keys: keys to be retrieved
+        :return: list of values in the same order as keys, value_default is used for not existing keys
+        """
+        coerce = self._coerce
+        keys = [coerce(key) for key in keys]
+        missing = [key for key in keys if key not in self.__data]
+        if not missing:
+            return [self.__data[key] for key in keys]
+
+        # Pending write-behind values are newer than the ones in redis
+        if self._dirty is not None:
+            results = [self._pending(self._key(key)) for key in missing]
+        else:
+            results = [None] * len(missing)
+        if any(data is None for data in results):
+            refresh = self._et and self._refresh_et
+            pipe = self._redis.pipeline(transaction=False)
+            for key in missing:
+                self._queue_get(pipe, self._key(key))
+                if refresh:
+                    pipe.expire(self._key(key), self._et)
+            stored = pipe.execute()
+            if refresh:
+                stored = stored[::2]
+            results = [
+                data if data is not None else redis_data
+                for data, redis_data in zip(results, stored)
+            ]
+
+        fetched = {}
+        defaults = {}
+        for key, data in zip(missing, results):
+            if data:
+                if self._decoder:
+                    data = self._decoder(data)
+                fetched[key] = data
+            elif self._default is not None:
+                defaults[key] = self._default
+
+        values = [
+            self.__data[key] if key in self.__data else fetched.get(key, self._default)
+            for key in keys
+        ]
+
+        for key, data in fetched.items():
+            self.__data[key] = data
+        self._evict_down_to(self._lmax)
+
+        if defaults:
+            self.mset(defaults)
+        return values
+
+    def update_path(self, key: STRINT, path: str, value: Any) -> None:
+        """
+        Update a part of stored 'rejson' value in place, without re-sending the whole document
+
+        :param key: key of the stored document
+        :param path: JSONPath inside the document, e.g. '$.items.bar'
+        :param value: new value to be set at path
+        :raise AssertionError when value_type is not 'rejson'
+        """
+        assert self._rejson, "update_path can be used only when value_type set to 'rejson'"
+        key = self._coerce(key)
+        rk = self._key(key)
+
+        # Pending write-behind document must land first, or the update would be applied to a
+        # missing or older document and then overwritten by the next flush
+        if self._dirty is not None and self._pending(rk) is not None:
+            self.flush()
+
+        # Local copy would be stale, it is fetched again on next access
+        self.__data.pop(key, None)
+        self._redis.execute_command("JSON.SET", rk, path, self._encoder(value))
+
+    def _pending(self, rk: str) -> Any:
+        dirty = self._dirty
+        # After close() the value is already in redis
+        data = dirty.get(rk) if dirty is not None else None
+        if data is None:
+            data = self._inflight.get(rk)
+        if data is None:
+            return None
+        # Decoder gets the same data type as when the value is read back from redis
+        return self._redis.get_encoder().decode(data)
+
+    def _mark_dirty(self, rk: str, data: Any) -> None:
+        # Validated by redis-py now, like write-through does, a bad value would fail every later flush
+        data = self._redis.get_encoder().encode(data)
+        with self._dirty_lock:
+            if self._dirty is not None:
+                self._dirty[rk] = data
+                if len(self._dirty) >= self._flush_batch:
+                    self._flush_event.set()
+                return
+        # close() switched to write-through after the caller checked, and has written all pending changes
+        self._write(rk, data)
+
+    def flush(self) -> None:
+        """
+        Write pending changes to redis in a single pipeline. Does nothing when write_behind is not enabled
+        """
+        if self._dirty is None:
+            return
+
+        with self._flush_lock:
+            # Writers only wait for the swap, not for the round-trip
+            with self._dirty_lock:
+                if not self._dirty:
+                    return
+                self._inflight = self._dirty
+                self._dirty = {}
+                batch = list(self._inflight.items())
+
+            pipe = self._redis.pipeline(transaction=False)
+            self._queue_batch(pipe, batch)
+
+            try:
+                pipe.execute()
+            except Exception:
+                encode = self._redis.get_encoder().encode
+                with self._dirty_lock:
+                    # Writes made during the flush are newer than the failed batch
+                    for rk, data in self._inflight.items():
+                        try:
+                            encode(data)
+                        except redis.DataError:
+                            # Retrying a value redis-py can't encode would fail every later flush
+                            continue
+                        self._dirty.setdefault(rk, data)
+                    self._inflight = {}
+                raise
+
+            with self._dirty_lock:
+                # Keys deleted while the batch was in flight have just been written back by it
+                deleted = [rk for rk, _ in batch if rk not in self._inflight]
+                self._inflight = {}
+
+            if deleted:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.delete(*deleted)
+                if self._index_key:
+                    pipe.srem(self._index_key, *[rk[len(self._prefix):] for rk in deleted])
+                pipe.execute()
+
+    def close(self) -> None:
+        """
+        Stop the background flush thread of write_behind mode and write pending changes to redis.
+        The cache stays usable afterwards, with writes going to redis directly.
+        Does nothing when write_behind is not enabled
+        """
+        if self._dirty is None:
+            return
+
+        self._flush_stop.set()
+        self._flush_event.set()
+        self._flush_thread.join()
+        atexit.unregister(self._flush_atexit)
+
+        self.flush()
+        # Writes made since are sent before switching to write-through, while writers wait on the lock
+        with self._flush_lock, self._dirty_lock:
+            if self._dirty:
+                pipe = self._redis.pipeline(transaction=False)
+                self._queue_batch(pipe, list(self._dirty.items()))
+                pipe.execute()
+            self._dirty = None
+
+    def __enter__(self) -> "FlipCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
 
     def refresh(self, key: STRINT) -> None:
+        key = self._coerce(key)
         if key in self.__data:
             self.__data.move_to_end(key)
 
         if self._et:
             self._redis.expire(self._key(key), time=self._et)
+
+    def refresh_many(self, keys: Iterable[STRINT]) -> None:
+        """
+        Refresh multiple keys at once, resetting their expire times in a single pipeline
+
+        :param keys: keys to be refreshed
+        """
+        pipe = self._redis.pipeline(transaction=False) if self._et else None
+        for key in keys:
+            key = self._coerce(key)
+            if key in self.__data:
+                self.__data.move_to_end(key)
+            if pipe is not None:
+                pipe.expire(self._key(key), time=self._et)
+
+        if pipe is not None:
+            pipe.execute()
@@ -0,0 +1,7 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def rdp():
+    return fakeredis.FakeRedis(decode_responses=True)
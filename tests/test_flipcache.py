@@ -0,0 +1,253 @@
+import math
+
+import pytest
+import redis
+
+from flipcache import FlipCache
+from flipcache import flipcache as flipcache_module
+
+
+def test_mset_mget(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, local_max=2)
+    cache.mset({"a": "1", "b": "2", "c": "3"})
+
+    assert rdp.mget("c:a", "c:b", "c:c") == ["1", "2", "3"]
+    assert len(cache.local) == 2
+    assert cache.mget(["a", "b", "c", "missing"]) == ["1", "2", "3", None]
+
+
+def test_mget_saves_value_default(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_default="x")
+    assert cache.mget(["a"]) == ["x"]
+    assert rdp.get("c:a") == "x"
+
+
+def test_mset_mget_json(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json", local_max=0)
+    cache.mset({"a": {"x": 1}, "b": [1, 2]})
+    assert cache.mget(["a", "b"]) == [{"x": 1}, [1, 2]]
+
+
+def test_mset_expire_time(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, expire_time=100)
+    cache.mset({"a": "1"})
+    assert 0 < rdp.ttl("c:a") <= 100
+
+
+def test_keep_index(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, key_type="int", keep_index=True)
+    cache[1] = "a"
+    cache[2] = "b"
+    cache.mset({3: "c"})
+    rdp.set("c:untracked", "x")
+
+    assert len(cache) == 3
+    assert sorted(cache) == [1, 2, 3]
+
+    del cache[2]
+    assert len(cache) == 2
+    assert sorted(cache) == [1, 3]
+
+
+def test_len_and_iter_scan_without_index(rdp):
+    cache = FlipCache("c:sub", redis_protocol=rdp)
+    cache["a"] = "1"
+    cache["b:c"] = "2"
+    rdp.set("other:a", "x")
+
+    assert len(cache) == 2
+    assert sorted(cache) == ["a", "b:c"]
+
+
+def test_get_or_none(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_default="x", local_max=0)
+    rdp.set("c:a", "1")
+
+    assert cache.get_or_none("a") == "1"
+    assert cache.get_or_none("missing") is None
+    assert rdp.get("c:missing") is None
+
+
+def test_contains(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, local_max=0)
+    rdp.set("c:a", "1")
+    assert "a" in cache
+    assert "missing" not in cache
+
+
+def test_rejson(rdp):
+    pytest.importorskip("jsonpath_ng")
+    cache = FlipCache("c", redis_protocol=rdp, value_type="rejson", local_max=0)
+    cache["a"] = {"items": {"foo": 1, "bar": 2}}
+
+    assert cache["a"] == {"items": {"foo": 1, "bar": 2}}
+    assert cache.mget(["a", "missing"]) == [{"items": {"foo": 1, "bar": 2}}, None]
+
+    cache.update_path("a", "$.items.bar", 5)
+    assert cache["a"] == {"items": {"foo": 1, "bar": 5}}
+
+
+def test_update_path_requires_rejson(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json")
+    with pytest.raises(AssertionError):
+        cache.update_path("a", "$.x", 1)
+
+
+def test_refresh_many(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, expire_time=100, local_max=3)
+    cache.mset({"a": "1", "b": "2", "c": "3"})
+    rdp.expire("c:a", 10)
+    rdp.expire("c:b", 10)
+
+    cache.refresh_many(["a", "b"])
+
+    assert rdp.ttl("c:a") > 10
+    assert rdp.ttl("c:b") > 10
+    # Refreshed keys are moved to the end of the eviction order
+    assert list(cache.local) == ["c", "a", "b"]
+
+
+def test_refresh_expire_time_on_get(rdp):
+    cache = FlipCache(
+        "c", redis_protocol=rdp, expire_time=100, refresh_expire_time_on_get=True, local_max=0
+    )
+    cache["a"] = "1"
+    rdp.expire("c:a", 10)
+
+    assert cache["a"] == "1"
+    assert rdp.ttl("c:a") > 10
+
+
+def test_skip_equal_writes(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, skip_equal_writes=True)
+    cache["a"] = "1"
+    rdp.delete("c:a")
+
+    # Equal local value, redis isn't written
+    cache["a"] = "1"
+    assert rdp.get("c:a") is None
+
+    cache["a"] = "2"
+    assert rdp.get("c:a") == "2"
+
+
+def test_skip_equal_writes_compares_types(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json", skip_equal_writes=True)
+    cache["a"] = 1
+    cache["a"] = 1.0
+    assert rdp.get("c:a") == "1.0"
+
+
+def test_skip_equal_writes_sends_mutated_objects(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json", skip_equal_writes=True)
+    data = {"x": 1}
+    cache["a"] = data
+    data["x"] = 2
+    cache["a"] = data
+    assert rdp.get("c:a") in ('{"x":2}', '{"x": 2}')
+
+
+def test_skip_equal_writes_overwrites_value_default(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_default="x", skip_equal_writes=True)
+    assert cache["a"] == "x"
+    rdp.delete("c:a")
+    cache["a"] = "x"
+    assert rdp.get("c:a") == "x"
+
+
+def test_skip_equal_writes_sends_copies_after_mutation(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json", skip_equal_writes=True)
+    data = {"x": 1}
+    cache["a"] = data
+    data["x"] = 2
+    cache["a"] = {"x": 2}
+    assert rdp.get("c:a") in ('{"x":2}', '{"x": 2}')
+
+    value = cache["a"]
+    value["n"] = 5
+    cache["a"] = dict(value)
+    assert cache.mget(["a"]) == [{"x": 2, "n": 5}]
+    cache.local.clear()
+    assert cache["a"] == {"x": 2, "n": 5}
+
+
+def test_json_uses_standard_json_module(rdp):
+    cache = FlipCache("c", redis_protocol=rdp, value_type="json", local_max=0)
+    # Written by older versions, not supported by orjson
+    rdp.set("c:nan", '{"x": NaN}')
+    cache["big"] = {"x": 2**70}
+
+    assert math.isnan(cache["nan"]["x"])
+    assert cache["big"] == {"x": 2**70}
+
+
+def test_orjson(rdp):
+    pytest.importorskip("orjson")
+    cache = FlipCache("c", redis_protocol=rdp, value_type="orjson", local_max=0)
+    cache["a"] = {1: "x", "y": [1.5, None]}
+    assert cache["a"] == {"1": "x", "y": [1.5, None]}
+
+    # Stored as regular JSON, readable by a 'json' cache
+    assert FlipCache("c", redis_protocol=rdp, value_type="json")["a"] == {"1": "x", "y": [1.5, None]}
+
+
+def test_prefer_unix_socket_falls_back_to_tcp(tmp_path, monkeypatch):
+    # Accessible path without a redis server behind it fails the ping check
+    not_a_socket = tmp_path / "redis.sock"
+    not_a_socket.touch()
+    monkeypatch.setattr(
+        flipcache_module, "REDIS_SOCKET_PATHS", (str(tmp_path / "missing.sock"), str(not_a_socket))
+    )
+
+    cache = FlipCache("c", prefer_unix_socket=True)
+    kwargs = cache.redis_protocol.get_connection_kwargs()
+    assert "path" not in kwargs
+    assert kwargs["socket_keepalive"] is True
+    assert kwargs["decode_responses"] is True
+
+
+def test_redis_protocol_passed_is_used(rdp):
+    assert FlipCache("c", redis_protocol=rdp, prefer_unix_socket=True).redis_protocol is rdp
+
+
+def test_prefer_unix_socket_uses_reachable_socket(tmp_path, monkeypatch):
+    sock = tmp_path / "redis.sock"
+    sock.touch()
+    monkeypatch.setattr(flipcache_module, "REDIS_SOCKET_PATHS", (str(sock),))
+    monkeypatch.setattr(redis.Redis, "ping", lambda self: True)
+
+    kwargs = FlipCache("c", prefer_unix_socket=True).redis_protocol.get_connection_kwargs()
+    assert kwargs["path"] == str(sock)
+    assert kwargs["decode_responses"] is True
+
+
+def test_refresh_on_get_falls_back_without_getex(rdp, monkeypatch):
+    def getex(*args, **kwargs):
+        raise redis.ResponseError("unknown command 'GETEX', with args beginning with: 'c:a'")
+
+    # Redis before 6.2
+    monkeypatch.setattr(rdp, "getex", getex)
+    cache = FlipCache(
+        "c", redis_protocol=rdp, expire_time=100, refresh_expire_time_on_get=True, local_max=0
+    )
+    cache["a"] = "1"
+    rdp.expire("c:a", 10)
+
+    assert cache["a"] == "1"
+    assert cache._read == cache._read_pipelined
+    assert rdp.ttl("c:a") > 10
+
+    rdp.expire("c:a", 10)
+    assert cache["a"] == "1"
+    assert rdp.ttl("c:a") > 10
+
+
+def test_refresh_on_get_raises_other_response_errors(rdp, monkeypatch):
+    def getex(*args, **kwargs):
+        raise redis.ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+
+    monkeypatch.setattr(rdp, "getex", getex)
+    cache = FlipCache("c", redis_protocol=rdp, expire_time=100, refresh_expire_time_on_get=True)
+    with pytest.raises(redis.ResponseError):
+        cache["a"]
+    assert cache._read == cache._read_getex
@@ -0,0 +1,308 @@
+import gc
+import threading
+import time
+
+import pytest
+import redis
+from redis.client import Pipeline
+
+from flipcache import FlipCache
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def make_cache(rdp):
+    caches = []
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval_ms", 60_000)
+        cache = FlipCache("wb", redis_protocol=rdp, write_behind=True, **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_set_is_deferred_until_flush(rdp, make_cache):
+    cache = make_cache()
+    cache["a"] = "1"
+    assert rdp.get("wb:a") is None
+    assert cache["a"] == "1"
+    cache.flush()
+    assert rdp.get("wb:a") == "1"
+
+
+def test_flush_on_flush_batch(rdp, make_cache):
+    cache = make_cache(flush_batch=3)
+    cache["a"] = "1"
+    cache["b"] = "2"
+    time.sleep(0.1)
+    assert rdp.get("wb:a") is None
+
+    cache["c"] = "3"
+    assert wait_for(lambda: rdp.get("wb:c") == "3")
+    assert rdp.mget("wb:a", "wb:b") == ["1", "2"]
+
+
+def test_flush_on_interval(rdp, make_cache):
+    cache = make_cache(flush_interval_ms=20)
+    cache["a"] = "1"
+    assert wait_for(lambda: rdp.get("wb:a") == "1")
+
+
+def test_mget_reads_pending_values(rdp, make_cache):
+    cache = make_cache(local_max=0)
+    cache["a"] = "1"
+    rdp.set("wb:b", "2")
+    assert cache.mget(["a", "b", "missing"]) == ["1", "2", None]
+
+
+def test_pending_values_visible_to_get_and_contains(make_cache):
+    cache = make_cache(local_max=0)
+    cache["a"] = "1"
+    assert cache["a"] == "1"
+    assert cache.get_or_none("a") == "1"
+    assert "a" in cache
+
+
+def test_len_and_iter_include_pending_writes(make_cache):
+    cache = make_cache()
+    cache["a"] = "1"
+    assert len(cache) == 1
+    assert list(cache) == ["a"]
+
+
+def test_delete_drops_pending_write(rdp, make_cache):
+    cache = make_cache(local_max=0)
+    cache["a"] = "1"
+    del cache["a"]
+    cache.flush()
+    assert rdp.get("wb:a") is None
+    assert cache["a"] is None
+
+
+def test_delete_during_flush_is_not_resurrected(rdp, make_cache, monkeypatch):
+    cache = make_cache(local_max=0)
+    cache["a"] = "1"
+    cache["b"] = "2"
+
+    started = threading.Event()
+    release = threading.Event()
+    execute = Pipeline.execute
+
+    def slow_execute(self, *args, **kwargs):
+        started.set()
+        release.wait(2)
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(Pipeline, "execute", slow_execute)
+    flusher = threading.Thread(target=cache.flush)
+    flusher.start()
+    assert started.wait(2)
+
+    # Writers don't wait for the flush round-trip
+    begin = time.monotonic()
+    del cache["a"]
+    cache["c"] = "3"
+    assert time.monotonic() - begin < 0.5
+    assert "a" not in cache
+    assert cache["b"] == "2"
+
+    release.set()
+    flusher.join(2)
+    monkeypatch.setattr(Pipeline, "execute", execute)
+
+    assert rdp.get("wb:a") is None
+    assert rdp.get("wb:b") == "2"
+    assert cache["a"] is None
+    cache.flush()
+    assert rdp.get("wb:c") == "3"
+
+
+def test_retry_after_redis_error(rdp, make_cache, monkeypatch):
+    cache = make_cache(local_max=0)
+    cache["a"] = "1"
+
+    execute = Pipeline.execute
+
+    def failing_execute(self, *args, **kwargs):
+        raise redis.ConnectionError("redis is down")
+
+    monkeypatch.setattr(Pipeline, "execute", failing_execute)
+    with pytest.raises(redis.ConnectionError):
+        cache.flush()
+
+    # Write made after the failed flush wins over the failed batch
+    cache["b"] = "2"
+    cache["a"] = "10"
+    assert cache["a"] == "10"
+
+    monkeypatch.setattr(Pipeline, "execute", execute)
+    cache.flush()
+    assert rdp.mget("wb:a", "wb:b") == ["10", "2"]
+
+
+def test_background_flush_retries_after_redis_error(rdp, make_cache, monkeypatch):
+    execute = Pipeline.execute
+    failures = []
+
+    def flaky_execute(self, *args, **kwargs):
+        if not failures:
+            failures.append(1)
+            raise redis.ConnectionError("redis is down")
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(Pipeline, "execute", flaky_execute)
+    cache = make_cache(flush_interval_ms=20)
+    cache["a"] = "1"
+    assert wait_for(lambda: rdp.get("wb:a") == "1")
+    assert failures
+
+
+def test_invalid_int_value_raises_on_set(rdp, make_cache):
+    cache = make_cache(value_type="int")
+    with pytest.raises(redis.DataError):
+        cache["a"] = None
+    cache["b"] = 5
+    cache.flush()
+    assert rdp.get("wb:b") == "5"
+
+
+def test_close_flushes_and_stops_thread(rdp, make_cache):
+    cache = make_cache()
+    thread = cache._flush_thread
+    cache["a"] = "1"
+    cache.close()
+
+    assert not thread.is_alive()
+    assert rdp.get("wb:a") == "1"
+
+    # Closed cache writes to redis directly
+    cache["b"] = "2"
+    assert rdp.get("wb:b") == "2"
+
+
+def test_context_manager_closes(rdp):
+    with FlipCache("wb", redis_protocol=rdp, write_behind=True) as cache:
+        cache["a"] = "1"
+        thread = cache._flush_thread
+    assert not thread.is_alive()
+    assert rdp.get("wb:a") == "1"
+
+
+def test_dropped_caches_stop_their_threads(rdp):
+    caches = [
+        FlipCache(f"wb{i}", redis_protocol=rdp, write_behind=True, flush_interval_ms=20)
+        for i in range(5)
+    ]
+    threads = [cache._flush_thread for cache in caches]
+    del caches
+    gc.collect()
+    assert wait_for(lambda: not any(thread.is_alive() for thread in threads))
+
+
+def test_update_path_applies_after_pending_document(rdp, make_cache):
+    pytest.importorskip("jsonpath_ng")
+    cache = make_cache(value_type="rejson")
+    cache["v"] = {"state": 5}
+    cache.update_path("v", "$.state", 9)
+    assert cache["v"] == {"state": 9}
+    cache.flush()
+    assert cache["v"] == {"state": 9}
+
+
+def test_pending_value_decoded_as_read_from_redis(rdp, make_cache):
+    received = []
+
+    def decoder(value):
+        received.append(type(value))
+        return value.split(":")
+
+    cache = make_cache(
+        value_type="custom",
+        value_encoder=lambda v: ":".join(v).encode(),
+        value_decoder=decoder,
+        local_max=0,
+    )
+    cache["a"] = ["x", "y"]
+    assert cache["a"] == ["x", "y"]
+    assert cache.mget(["a"]) == [["x", "y"]]
+    cache.flush()
+    assert cache["a"] == ["x", "y"]
+    assert received == [str, str, str]
+
+
+def test_invalid_custom_value_raises_on_set(rdp, make_cache):
+    cache = make_cache(value_type="custom", value_encoder=lambda v: v, value_decoder=lambda v: v)
+    with pytest.raises(redis.DataError):
+        cache["bad"] = {"x": 1}
+    cache["good"] = "1"
+    cache.flush()
+    assert rdp.get("wb:good") == "1"
+
+
+def test_flush_drops_values_redis_cannot_encode(rdp, make_cache):
+    cache = make_cache()
+    cache["good"] = "1"
+    # Bypasses the check made on set
+    cache._dirty["wb:bad"] = {"x": 1}
+
+    with pytest.raises(redis.DataError):
+        cache.flush()
+    cache.flush()
+    assert rdp.get("wb:good") == "1"
+    assert rdp.get("wb:bad") is None
+
+
+def test_background_flush_error_is_logged(make_cache, monkeypatch, caplog):
+    def failing_execute(self, *args, **kwargs):
+        raise redis.ConnectionError("redis is down")
+
+    monkeypatch.setattr(Pipeline, "execute", failing_execute)
+    cache = make_cache(flush_interval_ms=20)
+    with caplog.at_level("WARNING", logger="flipcache.flipcache"):
+        cache["a"] = "1"
+        assert wait_for(lambda: caplog.records)
+    assert "background flush failed" in caplog.records[0].getMessage()
+    monkeypatch.undo()
+
+
+def test_set_racing_close_writes_through(rdp, make_cache):
+    cache = make_cache(local_max=0)
+    cache.close()
+    # Writer that checked write_behind before close() switched it off
+    cache._mark_dirty("wb:a", "1")
+    assert rdp.get("wb:a") == "1"
+
+
+def test_no_writes_lost_on_close(rdp, make_cache):
+    cache = make_cache(flush_interval_ms=1, flush_batch=8)
+    start = threading.Event()
+
+    def writer(n):
+        start.wait()
+        for i in range(200):
+            cache[f"{n}-{i}"] = str(i)
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in writers:
+        thread.start()
+    start.set()
+    time.sleep(0.005)
+    cache.close()
+    for thread in writers:
+        thread.join()
+
+    assert all(
+        rdp.get(f"wb:{n}-{i}") == str(i) for n in range(4) for i in range(200)
+    )